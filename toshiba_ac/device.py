@@ -14,18 +14,40 @@
 
 import asyncio
 import datetime
-import struct
+import json
 import random
 import logging
 logger = logging.getLogger(__name__)
 logger.setLevel( logging.INFO )
 
 from toshiba_ac.fcu_state import ToshibaAcFcuState
-from toshiba_ac.utils import async_sleep_until_next_multiply_of_minutes
+from toshiba_ac.utils import async_sleep_until_next_multiply_of_minutes, period_with_jitter
 
 from azure.iot.device import Message
 from dataclasses import dataclass
 
+# Temperature values that mean "no reading"
+_NULLISH_TEMPS = frozenset((ToshibaAcFcuState.AcTemperature.NONE, ToshibaAcFcuState.AcTemperature.UNKNOWN))
+# Merit A features that only make sense while heating
+_HEAT_ONLY_MERITS = frozenset((ToshibaAcFcuState.AcMeritAFeature.HEATING_8C, ToshibaAcFcuState.AcMeritAFeature.FLOOR))
+
+# Heartbeat payload keys, the state fields they map to and the enum type
+# that coerces the raw value, in wire order
+_HB_FIELDS = (
+    ('iTemp', 'ac_indoor_temperature', ToshibaAcFcuState.AcTemperature),
+    ('oTemp', 'ac_outdoor_temperature', ToshibaAcFcuState.AcTemperature),
+    ('fcuTcTemp', 'ac_heatexc_in_temperature', ToshibaAcFcuState.AcTemperature),
+    ('fcuTcjTemp', 'ac_pipe_in_temperature', ToshibaAcFcuState.AcTemperature),
+    ('fcuFanRpm', 'ac_fan_in_rpm', ToshibaAcFcuState.AcRPM),
+    ('cduTdTemp', 'ac_comp_out_temperature', ToshibaAcFcuState.AcTemperature),
+    ('cduTsTemp', 'ac_comp_in_temperature', ToshibaAcFcuState.AcTemperature),
+    ('cduTeTemp', 'ac_heatexc_out_temperature', ToshibaAcFcuState.AcTemperature),
+    ('cduCompHz', 'ac_comp_freq', ToshibaAcFcuState.AcNumberValue),
+    ('cduFanRpm', 'ac_fan_out_rpm', ToshibaAcFcuState.AcRPM),
+    ('cduPmvPulse', 'ac_pwm_valve_duty', ToshibaAcFcuState.AcNumberValue),
+    ('cduIac', 'ac_iac', ToshibaAcFcuState.AcNumberValue),
+)
+
 class ToshibaAcDeviceError(Exception):
     pass
 
@@ -34,33 +56,39 @@ class ToshibaAcDeviceEnergyConsumption:
     energy_wh: float
     since: datetime.datetime
 
+_MISSING = object()
+
 class ToshibaAcDeviceCallback:
     def __init__(self):
-        self.callbacks = []
+        # dict as insertion-ordered set: O(1) membership in add/remove
+        self.callbacks = {}
 
     def add(self, callback):
-        if callback not in self.callbacks:
-            self.callbacks.append(callback)
-            return True
+        if callback in self.callbacks:
+            return False
 
-        return False
+        self.callbacks[callback] = None
+        return True
 
     def remove(self, callback):
-        if callback in self.callbacks:
-            self.callbacks.remove(callback)
-            return True
-
-        return False
+        return self.callbacks.pop(callback, _MISSING) is not _MISSING
 
     async def __call__(self, *args, **kwargs):
+        coros = []
+        iscoroutine = asyncio.iscoroutine
         for callback in self.callbacks:
-            asyncs = []
-            if asyncio.iscoroutinefunction(callback):
-                asyncs.append(callback(*args, **kwargs))
-            else:
-                callback(*args, **kwargs)
+            ret = callback(*args, **kwargs)
+            if iscoroutine(ret):
+                coros.append(ret)
 
-            await asyncio.gather(*asyncs)
+        if not coros:
+            return
+
+        if len(coros) == 1:
+            await coros[0]
+            return
+
+        await asyncio.gather(*coros)
 
 class ToshibaAcDevice:
     STATE_RELOAD_PERIOD_MINUTES = 5
@@ -86,6 +114,15 @@ class ToshibaAcDevice:
         self._ac_power = None
         self._ac_last_energy = None
         self._ac_last_power_update = None
+        self._rng = random.Random()
+
+        # Constant part of every command we send; only cmd/payload vary per call
+        self._cmd_template = {
+            'sourceId': device_id,
+            'messageId': '0000000',
+            'targetId': [ac_unique_id],
+            'timeStamp': '0000000'
+        }
 
         self.load_supported_merit_features(merit_feature, ac_model_id)
 
@@ -112,8 +149,11 @@ class ToshibaAcDevice:
 
     def load_supported_merit_features(self, merit_feature_hexstring, ac_model_id):
         try:
-            merit_byte, = struct.unpack('b', bytes.fromhex(merit_feature_hexstring[:2]))
-        except (TypeError, ValueError, struct.error):
+            merit_byte = int(merit_feature_hexstring[:2], 16)
+            # Keep the signed-byte interpretation of the old struct unpack
+            if merit_byte > 127:
+                merit_byte -= 256
+        except (TypeError, ValueError):
             ac_model_id = '1'
 
         supported_a_features = [ToshibaAcFcuState.AcMeritAFeature.OFF]
@@ -124,7 +164,11 @@ class ToshibaAcDevice:
             supported_a_features.append(ToshibaAcFcuState.AcMeritAFeature.HIGH_POWER)
             supported_a_features.append(ToshibaAcFcuState.AcMeritAFeature.ECO)
 
-            floor, _, cdu_silent, pure_ion, fireplace, heating_8c, _, _ = struct.unpack('????????', bytes.fromhex('0' + '0'.join(f'{merit_byte:08b}')))
+            floor = bool(merit_byte & 0x80)
+            cdu_silent = bool(merit_byte & 0x20)
+            pure_ion = bool(merit_byte & 0x10)
+            fireplace = bool(merit_byte & 0x08)
+            heating_8c = bool(merit_byte & 0x04)
 
             if floor:
                 supported_a_features.append(ToshibaAcFcuState.AcMeritAFeature.FLOOR)
@@ -142,27 +186,37 @@ class ToshibaAcDevice:
 
         self._supported_merit_a_features = supported_a_features
         self._supported_merit_b_features = supported_b_features
+        # Hashed copies for the O(1) membership checks in the setters
+        self._supported_merit_a_set = frozenset(supported_a_features)
+        self._supported_merit_b_set = frozenset(supported_b_features)
         self._is_pure_ion_supported = pure_ion
 
-        logger.debug(
-            '[{}] Supported merit A features: {}. Supported merit B features: {}. Pure ION supported: {}'.format(
-                self.name,
-                ", ".join(f.name.title().replace("_", " ") for f in supported_a_features),
-                ", ".join(f.name.title().replace("_", " ") for f in supported_b_features),
-                pure_ion
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                '[{}] Supported merit A features: {}. Supported merit B features: {}. Pure ION supported: {}'.format(
+                    self.name,
+                    ", ".join(f.name.title().replace("_", " ") for f in supported_a_features),
+                    ", ".join(f.name.title().replace("_", " ") for f in supported_b_features),
+                    pure_ion
+                )
             )
-        )
 
     async def periodic_state_reload(self):
+        loop = asyncio.get_running_loop()
+        last_work = 0.0
         while True:
-            delay = self.STATE_RELOAD_PERIOD_MINUTES * 60 + random.randint( -10, 10 )
-            logger.debug( f'State reload sleeping for {delay} seconds.')
+            # Subtract the previous iteration's work time so slow requests
+            # don't push the schedule further out every cycle
+            delay = max( 0.0, period_with_jitter( self.STATE_RELOAD_PERIOD_MINUTES * 60, rng=self._rng ) - last_work )
+            logger.debug( 'State reload sleeping for %s seconds.', delay )
             await asyncio.sleep( delay )
+            start = loop.time()
             await self.request_state_update()
+            last_work = loop.time() - start
 
     async def state_reload(self):
         hex_state = await self.http_api.get_device_state(self.ac_id)
-        logger.debug(f'[{self.name}] AC state from HTTP: {hex_state}')
+        logger.debug('[%s] AC state from HTTP: %s', self.name, hex_state)
         await self.handle_hex_state_update( hex_state )
 
     async def handle_hex_state_update( self, hex_state ):
@@ -175,29 +229,18 @@ class ToshibaAcDevice:
             await self.state_changed()
 
     async def state_changed(self):
-        logger.info(f'[{self.name}] Current state: {self.fcu_state}')
+        logger.info('[%s] Current state: %s', self.name, self.fcu_state)
         await self.on_state_changed_callback(self)
 
     async def handle_cmd_fcu_from_ac(self, payload):
-        logger.debug(f'[{self.name}] AC state from AMQP: {payload["data"]}')
+        logger.debug('[%s] AC state from AMQP: %s', self.name, payload['data'])
         await self.handle_hex_state_update( payload['data'] )
 
     async def handle_cmd_heartbeat(self, payload):
-        hb_data = {k : int(v, base=16) for k, v in payload.items()}
-        logger.debug(f'[{self.name}] AC heartbeat from AMQP: {hb_data}')
+        logger.debug('[%s] AC heartbeat from AMQP: %s', self.name, payload)
         state_update = ToshibaAcFcuState()
-        state_update.ac_indoor_temperature = hb_data[ 'iTemp' ]
-        state_update.ac_outdoor_temperature = hb_data[ 'oTemp' ]
-        state_update.ac_heatexc_in_temperature = hb_data[ 'fcuTcTemp' ]
-        state_update.ac_pipe_in_temperature = hb_data[ 'fcuTcjTemp' ]
-        state_update.ac_fan_in_rpm = hb_data[ 'fcuFanRpm' ]
-        state_update.ac_comp_out_temperature = hb_data[ 'cduTdTemp' ]
-        state_update.ac_comp_in_temperature = hb_data[ 'cduTsTemp' ]
-        state_update.ac_heatexc_out_temperature = hb_data[ 'cduTeTemp' ]
-        state_update.ac_comp_freq = hb_data[ 'cduCompHz' ]
-        state_update.ac_fan_out_rpm = hb_data[ 'cduFanRpm' ]
-        state_update.ac_pwm_valve_duty = hb_data[ 'cduPmvPulse' ]
-        state_update.ac_iac = hb_data[ 'cduIac' ]
+        for key, attr, enum_cls in _HB_FIELDS:
+            setattr( state_update, attr, enum_cls(int(payload[key], 16)) )
         state_delta = self.fcu_state.update_state( state_update )
         await self.handle_state_update( state_delta )
 
@@ -206,89 +249,62 @@ class ToshibaAcDevice:
         if self._ac_energy_consumption != val:
             self._ac_energy_consumption = val
 
-            logger.info(f'[{self.name}] Energy consumption: {val}')
+            logger.info('[%s] Energy consumption: %s', self.name, val)
 
             await self.on_energy_consumption_changed_callback(self)
 
     async def handle_update_ac_power( self, consumption_before, consumption ):
+        # Read the clock and the current hour's energy once up front
         now = datetime.datetime.now()
         hour = now.hour
-        # Get energy from current hour
         current_energy = consumption[hour]['Energy']
-        # If hour is 0 we have to look at yesterday
-        if hour == 0:
-            # For some reasons no data for yesterday
-            if consumption_before is None:
-                previous_energy = 0
-            else:
-                # Get last energy from yesterday
-                previous_energy = consumption_before[-1]['Energy']
-        else:
-            # Get energy from last hour
-            previous_energy = consumption[hour-1]['Energy']
+        last_update = self._ac_last_power_update
         # Special handling of first call
-        if self._ac_last_energy is None:
-            # Take energy of last hour
+        if last_update is None:
+            # Take energy of current hour over the seconds since it started
             energy = current_energy
-            # Seconds since start of current hour
             delta_second = now.minute * 60 + now.second
         else:
             # Special handling if we switched hours
-            if hour != self._ac_last_power_update.hour:
+            if hour != last_update.hour:
+                # Energy of the previous hour; if hour is 0 we have to look at yesterday
+                previous_energy = 0 if (hour == 0 and consumption_before is None) else (consumption_before[-1]['Energy'] if hour == 0 else consumption[hour-1]['Energy'])
                 # Use final value of last hour, subtract last stored state then add current hour
                 energy = previous_energy - self._ac_last_energy + current_energy
             else:
                 # Just use current value minus stored value
                 energy = current_energy - self._ac_last_energy
             # Seconds since last call
-            delta_t = now - self._ac_last_power_update
-            delta_second = delta_t.total_seconds()
-        # Energy from Wh to J
-        energy *= 3600
-        # Calculate power in W
-        self._ac_power = energy / delta_second
-        # Store last energy for next call
+            delta_second = (now - last_update).total_seconds()
+        # Energy from Wh to J, then power in W
+        self._ac_power = (energy * 3600.0) / delta_second
+        # Store last energy and time of this call for next call
         self._ac_last_energy = current_energy
-        # Store time of this call for next call
         self._ac_last_power_update = now
-        logger.info(f'[{self.name}] Power updated: {self._ac_power} W')
+        logger.info('[%s] Power updated: %s W', self.name, self._ac_power)
         await self.on_power_changed_callback(self)
 
     async def request_state_update( self ):
-        logger.debug( f"{self.name}: Requesting status" )
-        cmd = {
-            'sourceId': self.device_id,
-            'messageId': '0000000',
-            'targetId': [self.ac_unique_id],
-            'cmd': 'CMD_GET_STATUS',
-            'payload': {},
-            'timeStamp': '0000000'
-        }
+        logger.debug( '%s: Requesting status', self.name )
+        cmd = {**self._cmd_template, 'cmd': 'CMD_GET_STATUS', 'payload': {}}
         await self.send_command_to_ac( cmd )
 
     def create_cmd_fcu_to_ac(self, hex_state):
-        return {
-            'sourceId': self.device_id,
-            'messageId': '0000000',
-            'targetId': [self.ac_unique_id],
-            'cmd': 'CMD_FCU_TO_AC',
-            'payload': {'data': hex_state},
-            'timeStamp': '0000000'
-        }
+        return {**self._cmd_template, 'cmd': 'CMD_FCU_TO_AC', 'payload': {'data': hex_state}}
 
     async def send_command_to_ac(self, command):
-        msg = Message(str(command))
+        msg = Message(json.dumps(command, separators=(',', ':')))
         msg.custom_properties['type'] = 'mob'
         msg.content_type = "application/json"
         msg.content_encoding = "utf-8"
         await self.amqp_api.send_message(msg)
 
     async def send_state_to_ac(self, state):
-        future_state = ToshibaAcFcuState.from_hex_state(self.fcu_state.encode())
-        future_state.update(state.encode())
+        future_state = self.fcu_state.clone()
+        future_state.update_from(state)
 
         # In SAVE mode reported temperatures are 16 degrees higher than actual setpoint (only when heating)
-        if state.ac_temperature not in [ToshibaAcFcuState.AcTemperature.NONE, ToshibaAcFcuState.AcTemperature.UNKNOWN]:
+        if state.ac_temperature not in _NULLISH_TEMPS:
             if future_state.ac_mode == ToshibaAcFcuState.AcMode.HEAT:
                 if future_state.ac_merit_a_feature == ToshibaAcFcuState.AcMeritAFeature.HEATING_8C:
                     state.ac_temperature = ToshibaAcFcuState.AcTemperature(state.ac_temperature.value + 16)
@@ -296,37 +312,36 @@ class ToshibaAcDevice:
         if future_state.ac_mode != ToshibaAcFcuState.AcMode.HEAT:
             state.ac_merit_b_feature = ToshibaAcFcuState.AcMeritBFeature.OFF
 
-            if future_state.ac_merit_a_feature in [ToshibaAcFcuState.AcMeritAFeature.HEATING_8C, ToshibaAcFcuState.AcMeritAFeature.FLOOR]:
+            if future_state.ac_merit_a_feature in _HEAT_ONLY_MERITS:
                 state.ac_merit_a_feature = ToshibaAcFcuState.AcMeritAFeature.OFF
 
         # If we are requesting to turn on, we have to clear self cleaning flag
         if state.ac_status == ToshibaAcFcuState.AcStatus.ON and self.fcu_state.ac_self_cleaning == ToshibaAcFcuState.AcSelfCleaning.ON:
             state.ac_self_cleaning = ToshibaAcFcuState.AcSelfCleaning.OFF
 
-        logger.debug(f'[{self.name}] Sending command: {state}')
+        logger.debug('[%s] Sending command: %s', self.name, state)
 
         command = self.create_cmd_fcu_to_ac(state.encode())
         await self.send_command_to_ac(command)
 
+    async def set_ac_multi(self, **fields):
+        state = ToshibaAcFcuState.from_dict_state(fields)
+
+        await self.send_state_to_ac(state)
+
     @property
     def ac_status(self):
         return self.fcu_state.ac_status
 
     async def set_ac_status(self, val):
-        state = ToshibaAcFcuState()
-        state.ac_status = val
-
-        await self.send_state_to_ac(state)
+        await self.set_ac_multi(ac_status=val)
 
     @property
     def ac_mode(self):
         return self.fcu_state.ac_mode
 
     async def set_ac_mode(self, val):
-        state = ToshibaAcFcuState()
-        state.ac_mode = val
-
-        await self.send_state_to_ac(state)
+        await self.set_ac_multi(ac_mode=val)
 
     @property
     def ac_temperature(self):
@@ -336,75 +351,57 @@ class ToshibaAcDevice:
 
         if self.fcu_state.ac_mode == ToshibaAcFcuState.AcMode.HEAT:
             if self.fcu_state.ac_merit_a_feature == ToshibaAcFcuState.AcMeritAFeature.HEATING_8C:
-                if self.fcu_state.ac_temperature not in [ToshibaAcFcuState.AcTemperature.NONE, ToshibaAcFcuState.AcTemperature.UNKNOWN]:
+                if self.fcu_state.ac_temperature not in _NULLISH_TEMPS:
                     ret = ToshibaAcFcuState.AcTemperature(self.fcu_state.ac_temperature.value - 16)
 
-        if ret in [ToshibaAcFcuState.AcTemperature.NONE, ToshibaAcFcuState.AcTemperature.UNKNOWN]:
+        if ret in _NULLISH_TEMPS:
             return None
 
         return ret.value
 
     async def set_ac_temperature(self, val):
-        state = ToshibaAcFcuState()
-        state.ac_temperature = int(val)
-
-        await self.send_state_to_ac(state)
+        await self.set_ac_multi(ac_temperature=int(val))
 
     @property
     def ac_fan_mode(self):
         return self.fcu_state.ac_fan_mode
 
     async def set_ac_fan_mode(self, val):
-        state = ToshibaAcFcuState()
-        state.ac_fan_mode = val
-
-        await self.send_state_to_ac(state)
+        await self.set_ac_multi(ac_fan_mode=val)
 
     @property
     def ac_swing_mode(self):
         return self.fcu_state.ac_swing_mode
 
     async def set_ac_swing_mode(self, val):
-        state = ToshibaAcFcuState()
-        state.ac_swing_mode = val
-
-        await self.send_state_to_ac(state)
+        await self.set_ac_multi(ac_swing_mode=val)
 
     @property
     def ac_power_selection(self):
         return self.fcu_state.ac_power_selection
 
     async def set_ac_power_selection(self, val):
-        state = ToshibaAcFcuState()
-        state.ac_power_selection = val
-
-        await self.send_state_to_ac(state)
+        await self.set_ac_multi(ac_power_selection=val)
 
     @property
     def ac_merit_b_feature(self):
         return self.fcu_state.ac_merit_b_feature
 
     async def set_ac_merit_b_feature(self, val):
-        if val != ToshibaAcFcuState.AcMeritBFeature.NONE and val not in self.supported_merit_b_features:
+        if val != ToshibaAcFcuState.AcMeritBFeature.NONE and val not in self._supported_merit_b_set:
             raise ToshibaAcDeviceError(f'Trying to set unsupported merit b feature: {val.name.title().replace("_", " ")}')
 
-        state = ToshibaAcFcuState()
-        state.ac_merit_b_feature = val
-
-        await self.send_state_to_ac(state)
+        await self.set_ac_multi(ac_merit_b_feature=val)
 
     @property
     def ac_merit_a_feature(self):
         return self.fcu_state.ac_merit_a_feature
 
     async def set_ac_merit_a_feature(self, val):
-        if val != ToshibaAcFcuState.AcMeritAFeature.NONE and val not in self.supported_merit_a_features:
+        if val != ToshibaAcFcuState.AcMeritAFeature.NONE and val not in self._supported_merit_a_set:
             raise ToshibaAcDeviceError(f'Trying to set unsupported merit a feature: {val.name.title().replace("_", " ")}')
 
-        state = ToshibaAcFcuState()
-        state.ac_merit_a_feature = val
-
-        await self.send_state_to_ac(state)
+        await self.set_ac_multi(ac_merit_a_feature=val)
 
     @property
     def ac_air_pure_ion(self):
@@ -413,16 +410,13 @@ class ToshibaAcDevice:
     async def set_ac_air_pure_ion(self, val):
         if not self.is_pure_ion_supported:
             raise ToshibaAcDeviceError('Pure Ion feature is not supported by this device')
-        state = ToshibaAcFcuState()
-        state.ac_air_pure_ion = val
-
-        await self.send_state_to_ac(state)
+        await self.set_ac_multi(ac_air_pure_ion=val)
 
     @property
     def ac_indoor_temperature(self):
         ret = self.fcu_state.ac_indoor_temperature
 
-        if ret in [ToshibaAcFcuState.AcTemperature.NONE, ToshibaAcFcuState.AcTemperature.UNKNOWN]:
+        if ret in _NULLISH_TEMPS:
             return None
 
         return ret.value
@@ -431,7 +425,7 @@ class ToshibaAcDevice:
     def ac_outdoor_temperature(self):
         ret = self.fcu_state.ac_outdoor_temperature
 
-        if ret in [ToshibaAcFcuState.AcTemperature.NONE, ToshibaAcFcuState.AcTemperature.UNKNOWN]:
+        if ret in _NULLISH_TEMPS:
             return None
 
         return ret.value
@@ -15,8 +15,8 @@
 
 import asyncio
 from datetime import datetime
-import traceback
 import random
+import traceback
 import logging
 logger = logging.getLogger(__name__)
 logger.setLevel( logging.INFO )
@@ -24,13 +24,26 @@ logger.setLevel( logging.INFO )
 from toshiba_ac.http_api import ToshibaAcHttpApi
 from toshiba_ac.amqp_api import ToshibaAcAmqpApi
 from toshiba_ac.device import ToshibaAcDevice
-from toshiba_ac.utils import async_sleep_until_next_multiply_of_minutes
+from toshiba_ac.utils import async_sleep_until_next_multiply_of_minutes, period_with_jitter
+
+async def _gather( coros ):
+    # asyncio.gather has noticeable setup cost; skip it for the 0/1-element cases
+    if not coros:
+        return
+    if len( coros ) == 1:
+        await coros[0]
+        return
+    await asyncio.gather( *coros )
 
 class ToshibaAcDeviceManager:
     FETCH_ENERGY_CONSUMPTION_PERIOD_MINUTES = 10
 
     def __init__( self, loop, username, password, device_id=None, sas_token=None, use_power = False ):
         self.loop = loop
+        # On 3.12+ let gathered tasks run their first step eagerly instead of
+        # round-tripping through the event loop when they finish immediately
+        if hasattr( asyncio, 'eager_task_factory' ):
+            self.loop.set_task_factory( asyncio.eager_task_factory )
         self.username = username
         self.password = password
         self.http_api = None
@@ -39,8 +52,12 @@ class ToshibaAcDeviceManager:
         self.device_id = self.username + '_' + (device_id or '3e6e4eb5f0e5aa46')
         self.sas_token = sas_token
         self.devices = {}
+        self._device_ids = []
         self.periodic_fetch_energy_consumption_task = None
         self.use_power = use_power
+        self._yesterday_tail = None
+        self._yesterday_tail_date = None
+        self._rng = random.Random()
         self.lock = asyncio.Lock()
 
     async def connect(self):
@@ -73,7 +90,7 @@ class ToshibaAcDeviceManager:
             if self.periodic_fetch_energy_consumption_task:
                 self.periodic_fetch_energy_consumption_task.cancel()
 
-            await asyncio.gather(*[device.shutdown() for device in self.devices.values()])
+            await _gather([device.shutdown() for device in self.devices.values()])
 
             if self.amqp_api:
                 await self.amqp_api.shutdown()
@@ -84,19 +101,22 @@ class ToshibaAcDeviceManager:
                 self.http_api = None
 
     async def periodic_fetch_energy_consumption(self):
+        loop = asyncio.get_running_loop()
         while True:
+            start = loop.time()
             if self.use_power:
                 await self.fetch_energies_for_power()
             else:
                 await self.fetch_energy_consumption()
-            delay = self.FETCH_ENERGY_CONSUMPTION_PERIOD_MINUTES * 60 + random.randint( -10, 10 )
-            logger.debug( f'Fetch energy sleeping for {delay} seconds.')
+            # Sleep for the period minus the time the fetch itself took
+            delay = max( 0.0, period_with_jitter( self.FETCH_ENERGY_CONSUMPTION_PERIOD_MINUTES * 60, rng=self._rng ) - (loop.time() - start) )
+            logger.debug( 'Fetch energy sleeping for %s seconds.', delay )
             await asyncio.sleep( delay )
 
     async def fetch_energy_consumption(self):
-        consumptions = await self.http_api.get_devices_energy_consumption( [ac_unique_id for ac_unique_id in self.devices.keys()] )
+        consumptions = await self.http_api.get_devices_energy_consumption( self._device_ids )
 
-        logger.debug(f'Power consumption for devices: {consumptions}')
+        logger.debug('Power consumption for devices: %s', consumptions)
 
         updates = []
 
@@ -104,15 +124,23 @@ class ToshibaAcDeviceManager:
             update = self.devices[ac_unique_id].handle_update_ac_energy_consumption(consumption)
             updates.append(update)
 
-        await asyncio.gather(*updates)
+        await _gather(updates)
 
     async def fetch_energies_for_power(self):
-        consumptions = await self.http_api.get_devices_energy_consumption( [ac_unique_id for ac_unique_id in self.devices.keys()], offset_days=0, total=False )
-        logger.debug(f'Energy consumption for devices: {consumptions}')
-        if datetime.now().hour == 0:
-            logger.debug(f'Need more data because we changed days.')
-            consumptions_before = await self.http_api.get_devices_energy_consumption( [ac_unique_id for ac_unique_id in self.devices.keys()], offset_days=1, total=False )
-            logger.debug(f'Day before power consumption for devices: {consumptions_before}')
+        consumptions = await self.http_api.get_devices_energy_consumption( self._device_ids, offset_days=0, total=False )
+        logger.debug('Energy consumption for devices: %s', consumptions)
+        now = datetime.now()
+        if now.hour == 0:
+            # Yesterday's tail is fixed for the whole day, so fetch it only
+            # once and reuse it for the remaining ticks that fall in hour 0
+            if self._yesterday_tail_date == now.date():
+                consumptions_before = self._yesterday_tail
+            else:
+                logger.debug('Need more data because we changed days.')
+                consumptions_before = await self.http_api.get_devices_energy_consumption( self._device_ids, offset_days=1, total=False )
+                logger.debug('Day before power consumption for devices: %s', consumptions_before)
+                self._yesterday_tail = consumptions_before
+                self._yesterday_tail_date = now.date()
         else:
             consumptions_before = None
 
@@ -124,14 +152,14 @@ class ToshibaAcDeviceManager:
                 consumption_before = consumptions_before[ ac_unique_id ]
             update = self.devices[ac_unique_id].handle_update_ac_power( consumption_before, consumption )
             updates.append(update)
-        await asyncio.gather(*updates)
+        await _gather(updates)
 
     async def get_devices(self):
         async with self.lock:
             if not self.devices:
                 devices_info = await self.http_api.get_devices()
 
-                logger.debug(f'Found devices: {devices_info}')
+                logger.debug('Found devices: %s', devices_info)
 
                 connects = []
 
@@ -151,11 +179,12 @@ class ToshibaAcDeviceManager:
 
                     connects.append(device.connect())
 
-                    logger.debug(f'Adding device {device!r}')
+                    logger.debug('Adding device %r', device)
 
                     self.devices[device.ac_unique_id] = device
+                    self._device_ids.append(device.ac_unique_id)
 
-                await asyncio.gather(*connects)
+                await _gather(connects)
 
                 if not self.periodic_fetch_energy_consumption_task:
                     self.periodic_fetch_energy_consumption_task = asyncio.create_task( self.periodic_fetch_energy_consumption() )
@@ -16,18 +16,66 @@ import logging
 logger = logging.getLogger(__name__)
 logger.setLevel( logging.INFO )
 
+import copy
+from dataclasses import dataclass
+
+try:
+    # Optional: patches the stdlib enum machinery for ~3x faster member
+    # lookup, which dominates the decode path (20 by-value lookups per state)
+    import fastenum
+    fastenum.enable()
+except ImportError:
+    pass
+
 from enum import Enum
+import operator
 import struct
 
 _NONE_VAL = 0xff
 
+# Precompiled codec for the 19 wire bytes (merit B/A share one byte as
+# nibbles); parsing the format string per call is pure overhead
+_WIRE_STRUCT = struct.Struct('19B')
+
+class _PooledValueMeta(type):
+    # Mirrors the Enum API for the pooled value types below: calling the
+    # class looks the interned member up by value, subscripting by name
+    def __call__( cls, value ):
+        return cls._value2member_map_[value]
+
+    def __getitem__( cls, name ):
+        return cls._member_map_[name]
+
+def _value_pool( typename, names ):
+    # Build a lightweight stand-in for a big functional-API Enum: one
+    # interned member per distinct value with just .name and .value, no
+    # EnumMeta machinery behind lookups. Later names for an already seen
+    # value become aliases, like Enum.
+    cls = _PooledValueMeta( typename, (), { '__slots__': ('name', 'value') } )
+    value2member = {}
+    member_map = {}
+    for name, value in names:
+        member = value2member.get( value )
+        if member is None:
+            member = cls.__new__( cls )
+            member.name = name
+            member.value = value
+            value2member[value] = member
+        member_map[name] = member
+        if name.isidentifier():
+            setattr( cls, name, member )
+    cls._value2member_map_ = value2member
+    cls._member_map_ = member_map
+    return cls
+
+@dataclass( slots=True, eq=False, repr=False )
 class ToshibaAcFcuState:
 
-    AcNumberValue = Enum( 'AcNumberValue', tuple( (str(i), i) for i in range(0, 254)) + (("UNKNOWN", 0x7f), ("NONE", _NONE_VAL),) )
+    AcNumberValue = _value_pool( 'AcNumberValue', tuple( (str(i), i) for i in range(0, 254)) + (("UNKNOWN", 0x7f), ("NONE", _NONE_VAL),) )
 
-    AcTemperature = Enum('AcTemperature', tuple((str(i-0xff-1), i) for i in range(0x80, 0xff)) + (("-1", 0x7e), ("UNKNOWN", 0x7f)) + tuple((str(i), i) for i in range(0x00, 0x7f)) + (("NONE", _NONE_VAL),))
+    AcTemperature = _value_pool('AcTemperature', tuple((str(i-0xff-1), i) for i in range(0x80, 0xff)) + (("-1", 0x7e), ("UNKNOWN", 0x7f)) + tuple((str(i), i) for i in range(0x00, 0x7f)) + (("NONE", _NONE_VAL),))
 
-    AcRPM = Enum( 'AcRPM', tuple( (str(i*10), i) for i in range(0, 254)) + (("UNKNOWN", 0x7f), ("NONE", _NONE_VAL),) )
+    AcRPM = _value_pool( 'AcRPM', tuple( (str(i*10), i) for i in range(0, 254)) + (("UNKNOWN", 0x7f), ("NONE", _NONE_VAL),) )
 
     class AcNone(Enum):
         NONE = _NONE_VAL
@@ -159,21 +207,91 @@ class ToshibaAcFcuState:
         FAULT_DESCRPTION = 0x35
         NONE = _NONE_VAL
 
+    # One row per state field: attribute name, __str__ label and the
+    # human-readable description used in change log lines. The 20
+    # wire-format fields come first, in order, then the heartbeat-only
+    # readings.
+    _FIELDS = (
+        ('ac_status', 'Status', 'Status'),
+        ('ac_mode', 'Mode', 'Mode'),
+        ('ac_temperature', 'Temperature', 'Setpoint temperature'),
+        ('ac_fan_mode', 'FanMode', 'Fan mode'),
+        ('ac_swing_mode', 'SwingMode', 'Swing mode'),
+        ('ac_power_selection', 'PowerSelection', 'Power selection'),
+        ('ac_merit_b_feature', 'MeritBFeature', 'Merit B'),
+        ('ac_merit_a_feature', 'MeritAFeature', 'Merit A'),
+        ('ac_air_pure_ion', 'AirPureIon', 'Pure Ion'),
+        ('ac_indoor_temperature', 'IndoorTemperature', 'Indoor temperature'),
+        ('ac_outdoor_temperature', 'OutdoorTemperature', 'Outdoor temperature'),
+        ('ac_error', 'Error', 'Error'),
+        ('ac_timer_mode', 'Timer', 'Time Mode'),
+        ('ac_relative_hours', 'RelativeHours', 'Relative hours'),
+        ('ac_relative_minutes', 'RelativeMinutes', 'Relative minutes'),
+        ('ac_self_cleaning', 'SelfCleaning', 'Self cleaning'),
+        ('ac_led', 'LED', 'LED mode'),
+        ('ac_scheduler', 'Scheduler', 'Scheduler'),
+        ('ac_utc_hours', 'UtcHours', 'UTC hours'),
+        ('ac_utc_minutes', 'UtcMinutes', 'UTC minutes'),
+        ('ac_heatexc_in_temperature', 'IndoorHeatExchangerTemperature', 'Indoor heat exchanger temperature'),
+        ('ac_pipe_in_temperature', 'IndoorPipeTemperature', 'Indoor pipe temperature'),
+        ('ac_fan_in_rpm', 'IndoorFanRPM', 'Indoor fan RPM'),
+        ('ac_comp_out_temperature', 'CompressorOutletTemperature', 'Compressor outlet temperature'),
+        ('ac_comp_in_temperature', 'CompressorInletTemperature', 'Compressor inlet temperature'),
+        ('ac_heatexc_out_temperature', 'OutdoorHeatExchangerTemperature', 'Outdoor heat exchanger temperature'),
+        ('ac_comp_freq', 'CompressorFrequency', 'Compressor frequency'),
+        ('ac_fan_out_rpm', 'OutdoorFarnRPM', 'Outdoor fan RPM'),
+        ('ac_pwm_valve_duty', 'ValvePwmDutyCycle', 'Valve PWM duty cycle'),
+        ('ac_iac', 'IAC', 'IAC'),
+    )
+
+    _STATE_FIELDS = tuple( field[0] for field in _FIELDS )
+
+    # The dataclass machinery generates __init__ and __slots__ from these;
+    # every field defaults to its NONE member directly, with no coercion
+    name: str = 'Unknown'
+    ac_status: AcStatus = AcStatus.NONE
+    ac_mode: AcMode = AcMode.NONE
+    ac_temperature: AcTemperature = AcTemperature.NONE
+    ac_fan_mode: AcFanMode = AcFanMode.NONE
+    ac_swing_mode: AcSwingMode = AcSwingMode.NONE
+    ac_power_selection: AcPowerSelection = AcPowerSelection.NONE
+    ac_merit_b_feature: AcMeritBFeature = AcMeritBFeature.NONE
+    ac_merit_a_feature: AcMeritAFeature = AcMeritAFeature.NONE
+    ac_air_pure_ion: AcAirPureIon = AcAirPureIon.NONE
+    ac_indoor_temperature: AcTemperature = AcTemperature.NONE
+    ac_outdoor_temperature: AcTemperature = AcTemperature.NONE
+    ac_error: AcError = AcError.NONE
+    ac_timer_mode: AcTimerMode = AcTimerMode.NONE
+    ac_relative_hours: AcNumberValue = AcNumberValue.NONE
+    ac_relative_minutes: AcNumberValue = AcNumberValue.NONE
+    ac_self_cleaning: AcSelfCleaning = AcSelfCleaning.NONE
+    ac_led: AcLed = AcLed.NONE
+    ac_scheduler: AcScheduler = AcScheduler.NONE
+    ac_utc_hours: AcNumberValue = AcNumberValue.NONE
+    ac_utc_minutes: AcNumberValue = AcNumberValue.NONE
+    ac_heatexc_in_temperature: AcTemperature = AcTemperature.NONE
+    ac_pipe_in_temperature: AcTemperature = AcTemperature.NONE
+    ac_fan_in_rpm: AcRPM = AcRPM.NONE
+    ac_comp_out_temperature: AcTemperature = AcTemperature.NONE
+    ac_comp_in_temperature: AcTemperature = AcTemperature.NONE
+    ac_heatexc_out_temperature: AcTemperature = AcTemperature.NONE
+    ac_comp_freq: AcNumberValue = AcNumberValue.NONE
+    ac_fan_out_rpm: AcRPM = AcRPM.NONE
+    ac_pwm_valve_duty: AcNumberValue = AcNumberValue.NONE
+    ac_iac: AcNumberValue = AcNumberValue.NONE
+
     @classmethod
     def from_dict_state( cls, input ):
         state = cls()
         for name, val in input.items():
             # skip name attribute, if existing
-            if name != 'name':
-                if hasattr( state, name ):
-                    attr_type = type( getattr( state, name ) )
-                    if isinstance( val, str ):
-                        new_attr = attr_type[ val ]
-                    else:
-                        new_attr = attr_type( val )
-                    setattr( state, name, new_attr )
-                else:
-                    logger.warning( f'Skipping non-existing field: {name}.' )
+            if name == 'name':
+                continue
+            field_type = _FIELD_TYPES.get( name )
+            if field_type is None:
+                logger.warning( 'Skipping non-existing field: %s.', name )
+                continue
+            setattr( state, name, field_type[ val ] if isinstance( val, str ) else field_type( val ) )
         return state
 
     @classmethod
@@ -182,392 +300,166 @@ class ToshibaAcFcuState:
         state.decode(hex_state)
         return state
 
-    def __init__(self):
-        self.name = "Unknown"
-        self.ac_status = ToshibaAcFcuState.AcStatus.NONE
-        self.ac_mode = ToshibaAcFcuState.AcMode.NONE
-        self.ac_temperature = ToshibaAcFcuState.AcTemperature.NONE
-        self.ac_fan_mode = ToshibaAcFcuState.AcFanMode.NONE
-        self.ac_swing_mode = ToshibaAcFcuState.AcSwingMode.NONE
-        self.ac_power_selection = ToshibaAcFcuState.AcPowerSelection.NONE
-        self.ac_merit_b_feature = ToshibaAcFcuState.AcMeritBFeature.NONE
-        self.ac_merit_a_feature = ToshibaAcFcuState.AcMeritAFeature.NONE
-        self.ac_air_pure_ion = ToshibaAcFcuState.AcAirPureIon.NONE
-        self.ac_indoor_temperature = ToshibaAcFcuState.AcTemperature.NONE
-        self.ac_outdoor_temperature = ToshibaAcFcuState.AcTemperature.NONE
-        self.ac_error = ToshibaAcFcuState.AcError.NONE
-        self.ac_timer_mode = ToshibaAcFcuState.AcTimerMode.NONE
-        self.ac_relative_hours = ToshibaAcFcuState.AcNumberValue.NONE
-        self.ac_relative_minutes = ToshibaAcFcuState.AcNumberValue.NONE
-        self.ac_self_cleaning = ToshibaAcFcuState.AcSelfCleaning.NONE
-        self.ac_led = ToshibaAcFcuState.AcLed.NONE
-        self.ac_scheduler = ToshibaAcFcuState.AcScheduler.NONE
-        self.ac_utc_hours = ToshibaAcFcuState.AcNumberValue.NONE
-        self.ac_utc_minutes = ToshibaAcFcuState.AcNumberValue.NONE
-        self.ac_heatexc_in_temperature = ToshibaAcFcuState.AcTemperature.NONE
-        self.ac_pipe_in_temperature = ToshibaAcFcuState.AcTemperature.NONE
-        self.ac_fan_in_rpm = ToshibaAcFcuState.AcRPM.NONE
-        self.ac_comp_out_temperature = ToshibaAcFcuState.AcTemperature.NONE
-        self.ac_comp_in_temperature = ToshibaAcFcuState.AcTemperature.NONE
-        self.ac_heatexc_out_temperature = ToshibaAcFcuState.AcTemperature.NONE
-        self.ac_comp_freq = ToshibaAcFcuState.AcNumberValue.NONE
-        self.ac_fan_out_rpm = ToshibaAcFcuState.AcRPM.NONE
-        self.ac_pwm_valve_duty = ToshibaAcFcuState.AcNumberValue.NONE
-        self.ac_iac = ToshibaAcFcuState.AcNumberValue.NONE
-
-    def encode(self):
-        data = (self.ac_status,
-                self.ac_mode,
-                self.ac_temperature,
-                self.ac_fan_mode,
-                self.ac_swing_mode,
-                self.ac_power_selection,
-                self.ac_merit_b_feature,
-                self.ac_merit_a_feature,
-                self.ac_air_pure_ion,
-                self.ac_indoor_temperature,
-                self.ac_outdoor_temperature,
-                self.ac_error,
-                self.ac_timer_mode,
-                self.ac_relative_hours,
-                self.ac_relative_minutes,
-                self.ac_self_cleaning,
-                self.ac_led,
-                self.ac_scheduler,
-                self.ac_utc_hours,
-                self.ac_utc_minutes)
-        encoded = struct.pack('BBBBBBBBBBBBBBBBBBBB', *[prop.value for prop in data]).hex()
-        return encoded[:12] + encoded[13] + encoded[15] + encoded[16:] # Merit A/B features are encoded using half bytes but our packing added them as bytes
-
-
-    def decode(self, hex_state):
-        merit_b_pad = 'f' if hex_state[12] == 'f' else '0'
-        merit_a_pad = 'f' if hex_state[13] == 'f' else '0'
-        extended_hex_state = hex_state[:12] + merit_b_pad + hex_state[12] + merit_a_pad + hex_state[13:] # Merit A/B features are encoded using half bytes but our unpacking expect them as bytes
-        data = struct.unpack('BBBBBBBBBBBBBBBBBBBB', bytes.fromhex(extended_hex_state))
-        (self.ac_status,
-        self.ac_mode,
-        self.ac_temperature,
-        self.ac_fan_mode,
-        self.ac_swing_mode,
-        self.ac_power_selection,
-        self.ac_merit_b_feature,
-        self.ac_merit_a_feature,
-        self.ac_air_pure_ion,
-        self.ac_indoor_temperature,
-        self.ac_outdoor_temperature,
-        self.ac_error,
-        self.ac_timer_mode,
-        self.ac_relative_hours,
-        self.ac_relative_minutes,
-        self.ac_self_cleaning,
-        self.ac_led,
-        self.ac_scheduler,
-        self.ac_utc_hours,
-        self.ac_utc_minutes) = data
+    # Default-argument bindings turn repeated module/attribute lookups
+    # into local loads in the hot codec methods
+    def encode(self, _pack=_WIRE_STRUCT.pack):
+        return _pack(
+            self.ac_status.value,
+            self.ac_mode.value,
+            self.ac_temperature.value,
+            self.ac_fan_mode.value,
+            self.ac_swing_mode.value,
+            self.ac_power_selection.value,
+            # Merit B/A are carried as two nibbles in a single wire byte
+            ((self.ac_merit_b_feature.value & 0x0f) << 4) | (self.ac_merit_a_feature.value & 0x0f),
+            self.ac_air_pure_ion.value,
+            self.ac_indoor_temperature.value,
+            self.ac_outdoor_temperature.value,
+            self.ac_error.value,
+            self.ac_timer_mode.value,
+            self.ac_relative_hours.value,
+            self.ac_relative_minutes.value,
+            self.ac_self_cleaning.value,
+            self.ac_led.value,
+            self.ac_scheduler.value,
+            self.ac_utc_hours.value,
+            self.ac_utc_minutes.value
+        ).hex()
+
+
+    @classmethod
+    def decode_batch( cls, hex_states ):
+        # Parse all frames with one bytes.fromhex over the joined input
+        # instead of one call per state; useful when replaying logged
+        # traffic or backfilling from a broker queue
+        raw = bytes.fromhex( ''.join( hex_states ) )
+        states = []
+        for offset in range( 0, len(raw), 19 ):
+            state = cls()
+            state._decode_frame( raw[offset:offset + 19] )
+            states.append( state )
+        return states
+
+    def decode(self, hex_state, _fromhex=bytes.fromhex):
+        self._decode_frame( _fromhex( hex_state ) )
+
+    def _decode_frame(self, raw):
+        temp_map = _TEMP_MAP
+        numval_map = _NUMVAL_MAP
+        merit_byte = raw[6]
+        merit_b = merit_byte >> 4
+        merit_a = merit_byte & 0x0f
+        self.ac_status = _STATUS_MAP[raw[0]]
+        self.ac_mode = _MODE_MAP[raw[1]]
+        self.ac_temperature = temp_map[raw[2]]
+        self.ac_fan_mode = _FAN_MAP[raw[3]]
+        self.ac_swing_mode = _SWING_MAP[raw[4]]
+        self.ac_power_selection = _POWER_SEL_MAP[raw[5]]
+        # An all-ones nibble means NONE, matching the old 'f' padding rule
+        self.ac_merit_b_feature = _MERIT_B_MAP[0xff if merit_b == 0x0f else merit_b]
+        self.ac_merit_a_feature = _MERIT_A_MAP[0xff if merit_a == 0x0f else merit_a]
+        self.ac_air_pure_ion = _PURE_ION_MAP[raw[7]]
+        self.ac_indoor_temperature = temp_map[raw[8]]
+        self.ac_outdoor_temperature = temp_map[raw[9]]
+        self.ac_error = _ERROR_MAP[raw[10]]
+        self.ac_timer_mode = _TIMER_MAP[raw[11]]
+        self.ac_relative_hours = numval_map[raw[12]]
+        self.ac_relative_minutes = numval_map[raw[13]]
+        self.ac_self_cleaning = _SELF_CLEAN_MAP[raw[14]]
+        self.ac_led = _LED_MAP[raw[15]]
+        self.ac_scheduler = _SCHEDULER_MAP[raw[16]]
+        self.ac_utc_hours = numval_map[raw[17]]
+        self.ac_utc_minutes = numval_map[raw[18]]
 
     def update(self, hex_state):
         state_update = ToshibaAcFcuState.from_hex_state(hex_state)
         return self.update_state( state_update )
 
-    def update_single_state( self, state_update, last_update, state_name, state_desc ):
-        old_state = getattr( self, state_name )
-        new_state = getattr( state_update, state_name )
-        if new_state not in [ type(new_state).NONE, old_state ]:
-            logger.info( f'{self.name}: {state_desc} changed from {old_state.name} to {new_state.name}' )
-            setattr( self, state_name, new_state )
-            setattr( last_update, state_name, new_state )
-            return True
-        else:
-            return False
-
-    def update_state( self, state_update ):
-        last_update = ToshibaAcFcuState()
-        changed = False
-        changed = self.update_single_state( state_update, last_update, "ac_status", "Status" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_mode", "Mode" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_temperature", "Setpoint temperature" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_fan_mode", "Fan mode" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_swing_mode", "Swing mode" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_power_selection", "Power selection" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_merit_b_feature", "Merit B" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_merit_a_feature", "Merit A" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_air_pure_ion", "Pure Ion" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_indoor_temperature", "Indoor temperature" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_outdoor_temperature", "Outdoor temperature" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_error", "Error" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_timer_mode", "Time Mode" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_relative_hours", "Relative hours" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_relative_minutes", "Relative minutes" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_self_cleaning", "Self cleaning" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_led", "LED mode" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_scheduler", "Scheduler" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_utc_hours", "UTC hours" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_utc_minutes", "UTC minutes" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_heatexc_in_temperature", "Indoor heat exchanger temperature" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_pipe_in_temperature", "Indoor pipe temperature" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_fan_in_rpm", "Indoor fan RPM" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_comp_out_temperature", "Compressor outlet temperature" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_comp_in_temperature", "Compressor inlet temperature" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_heatexc_out_temperature", "Outdoor heat exchanger temperature" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_comp_freq", "Compressor frequency" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_fan_out_rpm", "Outdoor fan RPM" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_pwm_valve_duty", "Valve PWM duty cycle" ) or changed
-        changed = self.update_single_state( state_update, last_update, "ac_iac", "IAC" ) or changed
-        return last_update if changed else None
-
-    @property
-    def ac_status(self):
-        return self._ac_status
-    @ac_status.setter
-    def ac_status(self, val):
-        self._ac_status = ToshibaAcFcuState.AcStatus(val)
-
-    @property
-    def ac_mode(self):
-        return self._ac_mode
-    @ac_mode.setter
-    def ac_mode(self, val):
-        self._ac_mode = ToshibaAcFcuState.AcMode(val)
-
-    @property
-    def ac_temperature(self):
-        return self._ac_temperature
-    @ac_temperature.setter
-    def ac_temperature(self, val):
-        self._ac_temperature = ToshibaAcFcuState.AcTemperature(val)
-
-    @property
-    def ac_fan_mode(self):
-        return self._ac_fan_mode
-    @ac_fan_mode.setter
-    def ac_fan_mode(self, val):
-        self._ac_fan_mode = ToshibaAcFcuState.AcFanMode(val)
-
-    @property
-    def ac_swing_mode(self):
-        return self._ac_swing_mode
-    @ac_swing_mode.setter
-    def ac_swing_mode(self, val):
-        self._ac_swing_mode = ToshibaAcFcuState.AcSwingMode(val)
-
-    @property
-    def ac_power_selection(self):
-        return self._ac_power_selection
-    @ac_power_selection.setter
-    def ac_power_selection(self, val):
-        self._ac_power_selection = ToshibaAcFcuState.AcPowerSelection(val)
-
-    @property
-    def ac_merit_b_feature(self):
-        return self._ac_merit_b_feature
-    @ac_merit_b_feature.setter
-    def ac_merit_b_feature(self, val):
-        self._ac_merit_b_feature = ToshibaAcFcuState.AcMeritBFeature(val)
-
-    @property
-    def ac_merit_a_feature(self):
-        return self._ac_merit_a_feature
-    @ac_merit_a_feature.setter
-    def ac_merit_a_feature(self, val):
-        self._ac_merit_a_feature = ToshibaAcFcuState.AcMeritAFeature(val)
-
-    @property
-    def ac_air_pure_ion(self):
-        return self._ac_air_pure_ion
-    @ac_air_pure_ion.setter
-    def ac_air_pure_ion(self, val):
-        self._ac_air_pure_ion = ToshibaAcFcuState.AcAirPureIon(val)
-
-    @property
-    def ac_indoor_temperature(self):
-        return self._ac_indoor_temperature
-    @ac_indoor_temperature.setter
-    def ac_indoor_temperature(self, val):
-        self._ac_indoor_temperature = ToshibaAcFcuState.AcTemperature(val)
-
-    @property
-    def ac_outdoor_temperature(self):
-        return self._ac_outdoor_temperature
-    @ac_outdoor_temperature.setter
-    def ac_outdoor_temperature(self, val):
-        self._ac_outdoor_temperature = ToshibaAcFcuState.AcTemperature(val)
-
-    @property
-    def ac_error(self):
-        return self._ac_error
-    @ac_error.setter
-    def ac_error(self, val):
-        self._ac_error = ToshibaAcFcuState.AcError(val)
-
-    @property
-    def ac_timer_mode(self):
-        return self._ac_timer_mode
-    @ac_timer_mode.setter
-    def ac_timer_mode(self, val):
-        self._ac_timer_mode = ToshibaAcFcuState.AcTimerMode(val)
-
-    @property
-    def ac_relative_hours(self):
-        return self._ac_relative_hours
-    @ac_relative_hours.setter
-    def ac_relative_hours(self, val):
-        self._ac_relative_hours = ToshibaAcFcuState.AcNumberValue(val)
-
-    @property
-    def ac_relative_minutes(self):
-        return self._ac_relative_minutes
-    @ac_relative_minutes.setter
-    def ac_relative_minutes(self, val):
-        self._ac_relative_minutes = ToshibaAcFcuState.AcNumberValue(val)
-
-    @property
-    def ac_self_cleaning(self):
-        return self._ac_self_cleaning
-    @ac_self_cleaning.setter
-    def ac_self_cleaning(self, val):
-        self._ac_self_cleaning = ToshibaAcFcuState.AcSelfCleaning(val)
-
-    @property
-    def ac_led(self):
-        return self._ac_led
-    @ac_led.setter
-    def ac_led(self, val):
-        self._ac_led = ToshibaAcFcuState.AcLed(val)
-
-    @property
-    def ac_scheduler(self):
-        return self._ac_scheduler
-    @ac_scheduler.setter
-    def ac_scheduler(self, val):
-        self._ac_scheduler = ToshibaAcFcuState.AcScheduler(val)
-
-    @property
-    def ac_utc_hours(self):
-        return self._ac_utc_hours
-    @ac_utc_hours.setter
-    def ac_utc_hours(self, val):
-        self._ac_utc_hours = ToshibaAcFcuState.AcNumberValue(val)
-
-    @property
-    def ac_utc_minutes(self):
-        return self._ac_utc_minutes
-    @ac_utc_minutes.setter
-    def ac_utc_minutes(self, val):
-        self._ac_utc_minutes = ToshibaAcFcuState.AcNumberValue(val)
-
-    @property
-    def ac_heatexc_in_temperature(self):
-        return self._ac_heatexc_in_temperature
-    @ac_heatexc_in_temperature.setter
-    def ac_heatexc_in_temperature(self, val):
-        self._ac_heatexc_in_temperature = ToshibaAcFcuState.AcTemperature(val)
-
-    @property
-    def ac_pipe_in_temperature(self):
-        return self._ac_pipe_in_temperature
-    @ac_pipe_in_temperature.setter
-    def ac_pipe_in_temperature(self, val):
-        self._ac_pipe_in_temperature = ToshibaAcFcuState.AcTemperature(val)
-
-    @property
-    def ac_fan_in_rpm(self):
-        return self._ac_fan_in_rpm
-    @ac_fan_in_rpm.setter
-    def ac_fan_in_rpm(self, val):
-        self._ac_fan_in_rpm = ToshibaAcFcuState.AcRPM(val)
-
-    @property
-    def ac_comp_out_temperature(self):
-        return self._ac_comp_out_temperature
-    @ac_comp_out_temperature.setter
-    def ac_comp_out_temperature(self, val):
-        self._ac_comp_out_temperature = ToshibaAcFcuState.AcTemperature(val)
-
-    @property
-    def ac_comp_in_temperature(self):
-        return self._ac_comp_in_temperature
-    @ac_comp_in_temperature.setter
-    def ac_comp_in_temperature(self, val):
-        self._ac_comp_in_temperature = ToshibaAcFcuState.AcTemperature(val)
-
-    @property
-    def ac_heatexc_out_temperature(self):
-        return self._ac_heatexc_out_temperature
-    @ac_heatexc_out_temperature.setter
-    def ac_heatexc_out_temperature(self, val):
-        self._ac_heatexc_out_temperature = ToshibaAcFcuState.AcTemperature(val)
-
-    @property
-    def ac_comp_freq(self):
-        return self._ac_comp_freq
-    @ac_comp_freq.setter
-    def ac_comp_freq(self, val):
-        self._ac_comp_freq = ToshibaAcFcuState.AcNumberValue(val)
-
-    @property
-    def ac_fan_out_rpm(self):
-        return self._ac_fan_out_rpm
-    @ac_fan_out_rpm.setter
-    def ac_fan_out_rpm(self, val):
-        self._ac_fan_out_rpm = ToshibaAcFcuState.AcRPM(val)
-
-    @property
-    def ac_pwm_valve_duty(self):
-        return self._ac_pwm_valve_duty
-    @ac_pwm_valve_duty.setter
-    def ac_pwm_valve_duty(self, val):
-        self._ac_pwm_valve_duty = ToshibaAcFcuState.AcNumberValue(val)
-
-    @property
-    def ac_iac(self):
-        return self._ac_iac
-    @ac_iac.setter
-    def ac_iac(self, val):
-        self._ac_iac = ToshibaAcFcuState.AcNumberValue(val)
+    def clone(self):
+        return copy.copy(self)
 
-    def __str__(self):
-        res = f'Status: {self.ac_status.name}'
-        res += f', Mode: {self.ac_mode.name}'
-        res += f', Temperature: {self.ac_temperature.name}'
-        res += f', FanMode: {self.ac_fan_mode.name}'
-        res += f', SwingMode: {self.ac_swing_mode.name}'
-        res += f', PowerSelection: {self.ac_power_selection.name}'
-        res += f', MeritBFeature: {self.ac_merit_b_feature.name}'
-        res += f', MeritAFeature: {self.ac_merit_a_feature.name}'
-        res += f', AirPureIon: {self.ac_air_pure_ion.name}'
-        res += f', IndoorTemperature: {self.ac_indoor_temperature.name}'
-        res += f', OutdoorTemperature: {self.ac_outdoor_temperature.name}'
-        res += f', Error: {self.ac_error.name}'
-        res += f', Timer: {self.ac_timer_mode.name}'
-        res += f', RelativeHours: {self.ac_relative_hours.name}'
-        res += f', RelativeMinutes: {self.ac_relative_minutes.name}'
-        res += f', SelfCleaning: {self.ac_self_cleaning.name}'
-        res += f', LED: {self.ac_led.name}'
-        res += f', Scheduler: {self.ac_scheduler.name}'
-        res += f', UtcHours: {self.ac_utc_hours.name}'
-        res += f', UtcMinutes: {self.ac_utc_minutes.name}'
-        res += f', IndoorHeatExchangerTemperature: {self.ac_heatexc_in_temperature.name}'
-        res += f', IndoorPipeTemperature: {self.ac_pipe_in_temperature.name}'
-        res += f', IndoorFanRPM: {self.ac_fan_in_rpm.name}'
-        res += f', CompressorOutletTemperature: {self.ac_comp_out_temperature.name}'
-        res += f', CompressorInletTemperature: {self.ac_comp_in_temperature.name}'
-        res += f', OutdoorHeatExchangerTemperature: {self.ac_heatexc_out_temperature.name}'
-        res += f', CompressorFrequency: {self.ac_comp_freq.name}'
-        res += f', OutdoorFarnRPM: {self.ac_fan_out_rpm.name}'
-        res += f', ValvePwmDutyCycle: {self.ac_pwm_valve_duty.name}'
-        res += f', IAC: {self.ac_iac.name}'
+    def update_from(self, other, _getattr=getattr, _setattr=setattr):
+        # Copy every field that is actually set in other, without logging or
+        # round-tripping through the hex encoding. NONE members are
+        # singletons, so identity checks replace the .value compares.
+        for name, none_member in _NONE_SENTINELS:
+            val = _getattr(other, name)
+            if val is not none_member:
+                _setattr(self, name, val)
 
-        return res
+    # update_state is generated from _FIELDS at the bottom of this module
 
-    def forJson( self ):#
+    def __str__(self):
+        # _STR_GETTER fetches all 30 fields in one C-level call and the
+        # template is joined once at import, so this is a single format
+        return _STR_TEMPLATE.format( *(val.name for val in _STR_GETTER(self)) )
+
+    def forJson( self, _getattr=getattr ):
         res = {}
-        for name, val in vars( self ).items():
-            # Only add Enums (i.e. status values) and if they are not empty
-            if isinstance( val, Enum ) and val.value is not _NONE_VAL and val.name != 'UNKNOWN':
+        for attr, is_num, none_member in _JSON_SPEC:
+            val = _getattr( self, attr )
+            # Only add status values that are not empty; NONE members are
+            # singletons, so identity is enough
+            if val is not none_member and val.name != 'UNKNOWN':
                 # Special treatment for temperature and RPM values
-                if 'temperature' in name or 'rpm' in name:
-                    res[name[1:]] = int( val.name )
-                else:
-                    res[name[1:]] = val.value
+                res[attr] = int( val.name ) if is_num else val.value
         return res
+
+# Direct by-value lookup tables for the property setters: one dict hit
+# instead of a metaclass __call__ per coerced field
+_STATUS_MAP = ToshibaAcFcuState.AcStatus._value2member_map_
+_MODE_MAP = ToshibaAcFcuState.AcMode._value2member_map_
+_TEMP_MAP = ToshibaAcFcuState.AcTemperature._value2member_map_
+_FAN_MAP = ToshibaAcFcuState.AcFanMode._value2member_map_
+_SWING_MAP = ToshibaAcFcuState.AcSwingMode._value2member_map_
+_POWER_SEL_MAP = ToshibaAcFcuState.AcPowerSelection._value2member_map_
+_MERIT_B_MAP = ToshibaAcFcuState.AcMeritBFeature._value2member_map_
+_MERIT_A_MAP = ToshibaAcFcuState.AcMeritAFeature._value2member_map_
+_PURE_ION_MAP = ToshibaAcFcuState.AcAirPureIon._value2member_map_
+_ERROR_MAP = ToshibaAcFcuState.AcError._value2member_map_
+_TIMER_MAP = ToshibaAcFcuState.AcTimerMode._value2member_map_
+_NUMVAL_MAP = ToshibaAcFcuState.AcNumberValue._value2member_map_
+_SELF_CLEAN_MAP = ToshibaAcFcuState.AcSelfCleaning._value2member_map_
+_LED_MAP = ToshibaAcFcuState.AcLed._value2member_map_
+_SCHEDULER_MAP = ToshibaAcFcuState.AcScheduler._value2member_map_
+_RPM_MAP = ToshibaAcFcuState.AcRPM._value2member_map_
+
+_DEFAULTS = ToshibaAcFcuState()
+_NONE_SENTINELS = tuple( (name, getattr(_DEFAULTS, name)) for name in ToshibaAcFcuState._STATE_FIELDS )
+# Field name -> member type, for coercing dict input without reflection
+_FIELD_TYPES = { name: type(getattr(_DEFAULTS, name)) for name in ToshibaAcFcuState._STATE_FIELDS }
+_STR_TEMPLATE = ', '.join( f'{field[1]}: {{}}' for field in ToshibaAcFcuState._FIELDS )
+_STR_GETTER = operator.attrgetter( *ToshibaAcFcuState._STATE_FIELDS )
+# forJson's field classification and per-field NONE sentinels, computed once
+_JSON_SPEC = tuple(
+    (name, 'temperature' in name or 'rpm' in name, getattr(ToshibaAcFcuState(), name))
+    for name in ToshibaAcFcuState._STATE_FIELDS
+)
+
+def _build_update_state():
+    # Generate update_state as one straight-line function: per-field slot
+    # loads and identity compares against precomputed NONE sentinels instead
+    # of 30 update_single_state calls doing getattr/setattr by name
+    defaults = ToshibaAcFcuState()
+    ns = { 'logger': logger, 'logging': logging, 'ToshibaAcFcuState': ToshibaAcFcuState }
+    lines = [
+        'def update_state(self, state_update):',
+        '    last_update = ToshibaAcFcuState()',
+        '    changed = False',
+        '    log = logger.isEnabledFor(logging.INFO)',
+    ]
+    for name, _, desc in ToshibaAcFcuState._FIELDS:
+        none = '_NONE_' + name
+        ns[none] = getattr(defaults, name)
+        lines.append(f'    new = state_update.{name}')
+        lines.append(f'    if new is not {none} and new is not self.{name}:')
+        lines.append(f'        if log:')
+        lines.append(f"            logger.info('%s: {desc} changed from %s to %s', self.name, self.{name}.name, new.name)")
+        lines.append(f'        self.{name} = new')
+        lines.append(f'        last_update.{name} = new')
+        lines.append(f'        changed = True')
+    lines.append('    return last_update if changed else None')
+    exec(compile('\n'.join(lines), __file__, 'exec'), ns)
+    return ns['update_state']
+
+ToshibaAcFcuState.update_state = _build_update_state()
@@ -15,6 +15,14 @@
 
 import asyncio
 import datetime
+import random
+
+def period_with_jitter(base, pct=0.05, rng=random):
+    # Spread periodic work out so many devices in one process do not
+    # synchronise and hammer the HTTP endpoint at the same instant.
+    # Callers can pass their own random.Random to skip the module-level
+    # instance and its lock
+    return base * rng.uniform(1 - pct, 1 + pct)
 
 async def async_sleep_until_next_multiply_of_minutes(minutes):
     next = datetime.datetime.now() + datetime.timedelta(minutes=minutes)
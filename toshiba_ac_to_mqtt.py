@@ -21,11 +21,24 @@ mqtt_logger = logging.getLogger("MQTT")
 mqtt_logger.setLevel( logging.INFO )
 
 import asyncio
+import functools
 import json
 import platform
 import contextlib
 import asyncio_mqtt
 
+try:
+    # Optional: much faster serialization and bytes-native parsing on the
+    # per-message hot path; falls back to the stdlib when not installed
+    import orjson
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+except ImportError:
+    json_loads = json.loads
+    def json_dumps( obj ):
+        # Encode to bytes so publish payloads look the same either way
+        return json.dumps( obj, separators=(',', ':') ).encode()
+
 from toshiba_ac.device_manager import ToshibaAcDeviceManager
 from toshiba_ac.fcu_state import ToshibaAcFcuState
 
@@ -35,61 +48,84 @@ status_suffix = 'status'
 status_topic = topic_root + '/' + status_suffix
 cmd_suffix = 'cmd'
 cmd_topic = topic_root + '/' + cmd_suffix
-power_suffix = 'power'
+state_suffix = 'state'
+# State and power updates are idempotent and quickly overwritten, so skip
+# the four-way QoS 2 handshake for them; online/offline stays at QoS 2
+telemetry_qos = 0
+# How long to wait after a state delta for further deltas to merge into
+# the same publish
+state_coalesce_seconds = 0.05
 online_payload = 'online'
 offline_payload = 'offline'
+# Pre-encoded once; paho forwards bytes topics and payloads without
+# re-running the utf-8 encode on every publish
+status_topic_b = status_topic.encode( 'ascii' )
+online_payload_b = online_payload.encode( 'ascii' )
+offline_payload_b = offline_payload.encode( 'ascii' )
 ac_username = 'Your-Toshiba-Username'
 ac_password = 'Your-Toshiba-Password'
 
-# Task for device specific commands
-async def handle_ac_device_cmd( messages, dev ):
+# Clients tend to repeat the same small command payloads (e.g. plain
+# on/off), so cache the parsed prototype keyed on the raw bytes
+@functools.lru_cache( maxsize=128 )
+def parse_ac_cmd( payload ):
+    return ToshibaAcFcuState.from_dict_state( json_loads( payload ) )
+
+# Task for device specific commands; one pump for all devices, dispatched
+# on the device name segment of the topic
+async def handle_ac_device_cmd( messages, dev_by_name, cmd_queues ):
     async for msg in messages:
-        logger.info( f'Command for AC {dev.name}: {msg.payload}' )
-        new_state = ToshibaAcFcuState.from_dict_state( json.loads( msg.payload ) )
-        await dev.send_state_to_ac( new_state )
+        name = msg.topic.split( '/' )[1]
+        dev = dev_by_name.get( name )
+        if dev is None:
+            mqtt_logger.warning( 'Command for unknown AC "%s" on topic "%s"', name, msg.topic )
+            continue
+        logger.info( 'Command for AC %s: %s', dev.name, msg.payload )
+        # Clone the cached prototype: send_state_to_ac may adjust the
+        # temperature field for 8C mode before encoding
+        new_state = parse_ac_cmd( msg.payload ).clone()
+        queue = cmd_queues[dev]
+        # If the sender is still busy, the newer command supersedes the
+        # queued one; replace it instead of waiting
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait( new_state )
 
-# Energy updates should not happen
-async def energy_changed( dev ):
-    logger.error( 'Received energy update for device %s, this should not happen!' % dev)
+# Per-device sender: forwards the latest parsed command to the AC without
+# blocking the shared command pump
+async def send_ac_device_cmd( dev, queue ):
+    while True:
+        await dev.send_state_to_ac( await queue.get() )
 
 # Log a warning for messages received on unhandled topics
 async def log_unfiltered_message( messages ):
     async for msg in messages:
-        mqtt_logger.warning( f'Unexpected message received on topic "{msg.topic}": {str(msg.payload)}' )
+        mqtt_logger.warning( 'Unexpected message received on topic "%s": %s', msg.topic, msg.payload )
 
 async def cancel_tasks( tasks ):
     # Nothing to do if tasks is empty
     if not tasks:
-        logger.debug( f'No tasks to cancel.' )
+        logger.debug( 'No tasks to cancel.' )
         return
     # Cancel all tasks
-    logger.debug( f'Cancelling all tasks' )
+    logger.debug( 'Cancelling all tasks' )
     for task in tasks:
         task.cancel()
-    # Wait for 60 seconds for all tasks to finish (get cancelled)
-    logger.debug( f'Waiting for tasks to finish' )
-    await asyncio.wait( tasks, timeout = 60 )
-    # List of all task results
-    res = []
-    # Check all tasks
-    for task in tasks:
-        try:
-            # Check results of task
-            res.append( task.result() )
-        except asyncio.InvalidStateError as err:
-            # Task did not finish, so log a problem
-            logger.error( f'Task not cancelled in 60 seconds: {task.get_name()}' )
-            # Return the InvalidStateError
-            res.append( err )
-        except asyncio.CancelledError as err:
-            # Task was cancelled, so return the CancelledError
-            res.append( err )
-        except Exception as err:
-            # Task failed, so log and return the exception
-            logger.error( f'Exception occured in cancelled task {task.get_name()}')
-            logger.exception( err )
-            res.append( err )
-    # Return results of tasks that finished in time.
+    # Drain them all in one pass; exceptions come back as values instead
+    # of needing a per-task result/try/except loop
+    logger.debug( 'Waiting for tasks to finish' )
+    try:
+        res = await asyncio.wait_for( asyncio.gather( *tasks, return_exceptions = True ), timeout = 60 )
+    except asyncio.TimeoutError:
+        for task in tasks:
+            if not task.done():
+                logger.error( 'Task not cancelled in 60 seconds: %s', task.get_name() )
+        return None
+    for task, result in zip( tasks, res ):
+        if isinstance( result, Exception ) and not isinstance( result, asyncio.CancelledError ):
+            logger.error( 'Exception occured in cancelled task %s', task.get_name() )
+            logger.exception( result )
+    # Return results of the tasks
     return res
 
 async def mqtt_ac_task():
@@ -105,12 +141,12 @@ async def mqtt_ac_task():
         logger.debug( 'Connecting MQTT' )
         await stack.enter_async_context( client )
         # Register offline message callback
-        stack.push_async_callback( client.publish, status_topic, offline_payload, 2, True )
+        stack.push_async_callback( client.publish, status_topic_b, offline_payload_b, 2, True )
         # Publish online message
-        await client.publish( status_topic, online_payload, 2, True )
+        await client.publish( status_topic_b, online_payload_b, 2, True )
         # Start task to handle otherwise unhandled topics
         logger.debug( 'Registering unfiltered messages' )
-        unfiltered_messages = await stack.enter_async_context( client.unfiltered_messages() )
+        unfiltered_messages = await stack.enter_async_context( client.unfiltered_messages( queue_maxsize=64 ) )
         logger.debug( 'Starting task for unfiltered messages' )
         tasks.append( asyncio.create_task( log_unfiltered_message( unfiltered_messages ) ) )
 
@@ -122,67 +158,116 @@ async def mqtt_ac_task():
         # Connect to AC device manager
         await device_manager.connect()
 
-        # Send updated power to MQTT
-        async def power_changed( dev ):
-            logger.debug( 'Power changed for device %s' % dev)
-            topic = f'{topic_root}/{dev.name}/{power_suffix}'
-            msg = json.dumps( {'Name': dev.name, 'Power': dev.ac_power})
-            logger.debug( f'Sending MQTT power update with topic {topic}: {msg}' )
-            await client.publish( topic, msg, 2 )
-
-        # Send updated state to MQTT
-        async def state_update( dev, state ):
-            topic = f'{topic_root}/{dev.name}/{status_suffix}'
-            state_flt = state.forJson()
-            if state_flt:
-                msg = json.dumps( { 'Name': dev.name, 'Status': state_flt } )
-                logger.debug( f'Sending MQTT status update with topic {topic}: {msg}' )
-                await client.publish( topic, msg, 2 )
+        # Per-device queues feeding the coalescing workers below
+        state_queues = {}
+        # Payload of the last publish per device, used to skip publishes
+        # that would repeat the previous one byte for byte
+        last_published = {}
+
+        # One callback for every per-device event; the kind is prebound at
+        # registration so the library dispatches a single closure per slot
+        async def on_dev_event( dev, kind ):
+            if kind == 'state':
+                logger.debug( 'State changed for device %s', dev )
+                # Hand the delta to the coalescing worker
+                state_queues[dev].put_nowait( ( 'Status', dev.fcu_state_delta ) )
+            elif kind == 'power':
+                logger.debug( 'Power changed for device %s', dev )
+                state_queues[dev].put_nowait( ( 'Power', dev.ac_power ) )
             else:
-                logger.info( f'Not sending empty state update on topic {topic}' )
+                # Energy updates should not happen when running in power mode
+                logger.error( 'Received energy update for device %s, this should not happen!', dev )
+
+        state_changed = functools.partial( on_dev_event, kind='state' )
+        power_changed = functools.partial( on_dev_event, kind='power' )
+        energy_changed = functools.partial( on_dev_event, kind='energy' )
 
-        # Callback for state updates
-        async def state_changed( dev ):
-            logger.debug( 'State changed for device %s' % dev)
-            await state_update( dev, dev.fcu_state_delta )
+        # Merge bursts of updates into a single publish: wait briefly after
+        # the first one, fold everything that arrived into the device's
+        # merged document, then publish the whole thing retained. The doc
+        # accumulates status deltas, so the retained message always carries
+        # the full known state plus the latest power reading.
+        async def state_publish_worker( dev, queue ):
+            doc = dev_state_docs[dev]
+            while True:
+                updates = [ await queue.get() ]
+                await asyncio.sleep( state_coalesce_seconds )
+                while not queue.empty():
+                    updates.append( queue.get_nowait() )
+                for key, val in updates:
+                    if key == 'Status':
+                        doc['Status'].update( val.forJson() )
+                    else:
+                        doc['Power'] = val
+                msg = state_prefixes[dev] + json_dumps( doc['Status'] ) + b',"Power":' + json_dumps( doc['Power'] ) + b'}'
+                if last_published.get( dev ) == msg:
+                    logger.debug( 'State of device %s unchanged, skipping publish', dev )
+                    continue
+                last_published[dev] = msg
+                logger.debug( 'Sending MQTT state update with topic %s: %s', dev_topics[dev], msg )
+                await client.publish( dev_topics[dev], msg, telemetry_qos, True )
 
         # Get all connected AC devices
         devices = await device_manager.get_devices()
+        # The device set is fixed for the lifetime of the task, so build the
+        # per-device topic, payload prefix and merged document once
+        dev_topics = { dev: f'{topic_root}/{dev.name}/{state_suffix}' for dev in devices }
+        # The payload has a fixed outer shape, so prebuild the name half
+        # once per device; each publish then only encodes the changing parts
+        state_prefixes = { dev: b'{"Name":' + json_dumps( dev.name ) + b',"Status":' for dev in devices }
+        dev_state_docs = { dev: { 'Status': {}, 'Power': None } for dev in devices }
         tasks.append( device_manager.periodic_fetch_energy_consumption_task )
         # Connect each device and register callbacks
         for device in devices:
             tasks.append( device.periodic_reload_state_task )
+            state_queues[device] = asyncio.Queue()
+            tasks.append( asyncio.create_task( state_publish_worker( device, state_queues[device] ) ) )
             device.on_state_changed_callback.add( state_changed )
-            await device.state_changed()
             device.on_energy_consumption_changed_callback.add( energy_changed )
             device.on_power_changed_callback.add( power_changed )
-            # Start task to handle device specific commands
-            topic = f'{topic_root}/{device.name}/{cmd_suffix}'
-            logger.debug( f'Registering {topic} messages' )
-            ac_dev_cmd_messages = await stack.enter_async_context( client.filtered_messages( topic ) )
-            logger.debug( f'Starting task for {topic} messages' )
-            tasks.append( asyncio.create_task( handle_ac_device_cmd( ac_dev_cmd_messages, device ) ) )
-            # Subscribe to cmd_topic
-            logger.debug( f'Subscribing to {topic}' )
-            await client.subscribe( topic )
-
-        # Send states of all devices
+
+        # Push the initial state of every device at once instead of one
+        # bootstrap publish round-trip at a time
+        await asyncio.gather( *( device.state_changed() for device in devices ) )
+
+        # Start one task handling the command topics of all devices: a
+        # single wildcard subscription and message queue instead of one
+        # filtered_messages context and pump task per device
+        dev_cmd_topic = f'{topic_root}/+/{cmd_suffix}'
+        logger.debug( f'Registering {dev_cmd_topic} messages' )
+        ac_dev_cmd_messages = await stack.enter_async_context( client.filtered_messages( dev_cmd_topic, queue_maxsize=16 ) )
+        logger.debug( f'Starting task for {dev_cmd_topic} messages' )
+        dev_by_name = { dev.name: dev for dev in devices }
+        # One-slot queues between the pump and the per-device senders, so a
+        # slow send_state_to_ac never stalls commands for other devices and
+        # stale commands for the same device get replaced, not queued
+        cmd_queues = { dev: asyncio.Queue( maxsize=1 ) for dev in devices }
+        for device in devices:
+            tasks.append( asyncio.create_task( send_ac_device_cmd( device, cmd_queues[device] ) ) )
+        tasks.append( asyncio.create_task( handle_ac_device_cmd( ac_dev_cmd_messages, dev_by_name, cmd_queues ) ) )
+        # Subscribe to the wildcard command topic
+        logger.debug( f'Subscribing to {dev_cmd_topic}' )
+        await client.subscribe( dev_cmd_topic )
+
+        # Send states of all devices: feed the full state through the
+        # workers, which merge, deduplicate and publish concurrently
         async def state_update_all_dev( devices ):
+            logger.debug( 'Sending regular state update for %s devices', len( devices ) )
             for dev in devices:
-                    logger.debug( 'Sending regular state update for device %s' % dev)
-                    await state_update( dev, dev.fcu_state )
+                state_queues[dev].put_nowait( ( 'Status', dev.fcu_state ) )
 
         # Handle general commands
         async def handle_ac_cmd( messages, devices ):
             async for msg in messages:
-                if msg.payload.decode() == 'status':
+                # Compare raw bytes; no per-message decode/allocation
+                if msg.payload == b'status':
                     await state_update_all_dev( devices )
                 else:
-                    mqtt_logger.warning( f'Not implemented: Message received on topic "{msg.topic}": {str(msg.payload)}' )
+                    mqtt_logger.warning( 'Not implemented: Message received on topic "%s": %s', msg.topic, msg.payload )
 
         # Start task to handle cmd_topic messages
         logger.debug( f'Registering {cmd_topic} messages' )
-        ac_cmd_messages = await stack.enter_async_context( client.filtered_messages( cmd_topic ) )
+        ac_cmd_messages = await stack.enter_async_context( client.filtered_messages( cmd_topic, queue_maxsize=16 ) )
         logger.debug( f'Starting task for {cmd_topic} messages' )
         tasks.append( asyncio.create_task( handle_ac_cmd( ac_cmd_messages, devices ) ) )
         # Subscribe to cmd_topic
@@ -193,7 +278,7 @@ async def mqtt_ac_task():
         async def regular_state_update( devices ):
             while True:
                 delay = 60 * 60
-                logger.debug( f'Regular state update sleeping for {delay} seconds.')
+                logger.debug( 'Regular state update sleeping for %s seconds.', delay )
                 await asyncio.sleep( delay )
                 await state_update_all_dev( devices )
 
@@ -203,7 +288,14 @@ async def mqtt_ac_task():
         logger.debug( 'Monitoring tasks' )
         done, pending = await asyncio.wait( tasks, return_when = asyncio.FIRST_COMPLETED )
         logger.warning( 'At least one task crashed.' )
-        done.pop().result()
+        # Cancel the survivors right away instead of letting them keep
+        # queueing work until the exit stack gets around to them
+        for task in pending:
+            task.cancel()
+        # Raise the first failure; checking every finished task avoids
+        # losing a second traceback if several crashed together
+        for task in done:
+            task.result()
         logger.debug( 'mqtt_ac_task finished.' )
 
 async def main():
@@ -214,4 +306,12 @@ if __name__ == '__main__':
     # Asyncio MQTT needs a special event loop on windows.
     if platform.system() == 'Windows':
         asyncio.set_event_loop_policy( asyncio.WindowsSelectorEventLoopPolicy() )
+    else:
+        try:
+            # Optional: uvloop cuts event-loop overhead considerably for
+            # socket-heavy workloads like this one
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            pass
     asyncio.run( main() )